@@ -0,0 +1,86 @@
+package main
+
+import (
+	"container/list"
+	"sync"
+	"time"
+)
+
+// --- 인메모리 TTL LRU 캐시 ---
+
+// ttlCache는 place_name 단위 조회 결과를 짧은 TTL 동안 보관하는 간단한 LRU 캐시입니다.
+// 같은 키에 대한 동시 조회는 첫 호출만 실제 작업을 수행하고, 나머지는 그 결과를 기다립니다.
+type ttlCache[V any] struct {
+	mu      sync.Mutex
+	ttl     time.Duration
+	maxSize int
+	entries map[string]*list.Element
+	order   *list.List // 가장 최근에 사용된 항목이 앞(front)에 위치
+}
+
+type cacheEntry[V any] struct {
+	key    string
+	value  V
+	err    error
+	expiry time.Time
+	ready  chan struct{} // 닫히면 value/err가 확정된 상태
+}
+
+func newTTLCache[V any](maxSize int, ttl time.Duration) *ttlCache[V] {
+	return &ttlCache[V]{
+		ttl:     ttl,
+		maxSize: maxSize,
+		entries: make(map[string]*list.Element),
+		order:   list.New(),
+	}
+}
+
+// getOrFetch는 캐시된 값이 있으면 그대로 반환하고, 없으면 fetch를 한 번만 실행해 결과를
+// 캐시합니다. 실패한 조회는 캐시하지 않으므로 다음 호출이 다시 시도합니다.
+func (c *ttlCache[V]) getOrFetch(key string, fetch func() (V, error)) (V, error) {
+	c.mu.Lock()
+	if el, ok := c.entries[key]; ok {
+		ent := el.Value.(*cacheEntry[V])
+		select {
+		case <-ent.ready:
+			if ent.err == nil && time.Now().Before(ent.expiry) {
+				c.order.MoveToFront(el)
+				c.mu.Unlock()
+				return ent.value, nil
+			}
+			// 만료된 항목은 버리고 아래에서 새로 조회합니다.
+			c.order.Remove(el)
+			delete(c.entries, key)
+		default:
+			// 동일 키 조회가 진행 중이면 중복 요청 없이 그 결과를 기다립니다.
+			c.mu.Unlock()
+			<-ent.ready
+			return ent.value, ent.err
+		}
+	}
+
+	ent := &cacheEntry[V]{key: key, ready: make(chan struct{})}
+	el := c.order.PushFront(ent)
+	c.entries[key] = el
+	if c.order.Len() > c.maxSize {
+		oldest := c.order.Back()
+		c.order.Remove(oldest)
+		delete(c.entries, oldest.Value.(*cacheEntry[V]).key)
+	}
+	c.mu.Unlock()
+
+	value, err := fetch()
+
+	c.mu.Lock()
+	ent.value, ent.err = value, err
+	ent.expiry = time.Now().Add(c.ttl)
+	if err != nil {
+		if cur, ok := c.entries[key]; ok && cur == el {
+			c.order.Remove(el)
+			delete(c.entries, key)
+		}
+	}
+	c.mu.Unlock()
+	close(ent.ready)
+	return value, err
+}
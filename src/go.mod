@@ -2,8 +2,9 @@ module github.com/Mireu-Lab/mcp-server-kakao-map
 
 go 1.24.5
 
+require github.com/modelcontextprotocol/go-sdk v0.3.1
+
 require (
 	github.com/google/jsonschema-go v0.2.1-0.20250825175020-748c325cec76 // indirect
-	github.com/modelcontextprotocol/go-sdk v0.3.1 // indirect
 	github.com/yosida95/uritemplate/v3 v3.0.2 // indirect
 )
@@ -1,21 +1,27 @@
 package main
 
 import (
+	"bytes"
 	"context"
 	"encoding/json"
 	"fmt"
+	"io"
 	"log/slog"
+	"net"
 	"net/http"
+	"net/url"
 	"os"
+	"strings"
 	"sync"
 	"time"
 
-	// 실제 존재하는 공식 SDK 경로
 	"github.com/modelcontextprotocol/go-sdk/mcp"
 )
 
 // --- 데이터 구조 정의 (Structs) ---
 
+// SearchSchema는 도구 입력 스키마입니다. go-sdk가 인자를 encoding/json으로
+// 한 번에 디코딩하므로 별도의 검증/파서 설정은 필요하지 않습니다.
 type SearchSchema struct {
 	Query string `json:"query" jsonschema:"Korean keywords for searching places in South Korea."`
 }
@@ -28,10 +34,8 @@ type MapDocument struct {
 	Phone        string `json:"phone"`
 }
 
-type KakaoLocalSearchResponse struct {
-	Documents []MapDocument `json:"documents"`
-}
-
+// WebDocument는 다음 웹 검색 결과에서 title/contents만 투영합니다.
+// encoding/json은 태그에 없는 필드(url, datetime 등)를 디코딩 단계에서 건너뜁니다.
 type WebDocument struct {
 	Title    string `json:"title"`
 	Contents string `json:"contents"`
@@ -49,28 +53,55 @@ type DaumImageSearchResponse struct {
 	Documents []ImageDocument `json:"documents"`
 }
 
+// KakaoLocalSearchResult는 MapDocument를 임베딩해 동일한 JSON 키를 그대로 내보냅니다.
 type KakaoLocalSearchResult struct {
-	PlaceName    string        `json:"place_name"`
-	AddressName  string        `json:"address_name"`
-	CategoryName string        `json:"category_name"`
-	PlaceURL     string        `json:"place_url"`
-	Phone        string        `json:"phone"`
-	ImageURL     string        `json:"image_url"`
-	Comments     []WebDocument `json:"comments"`
+	MapDocument
+	ImageURL string        `json:"image_url"`
+	Comments []WebDocument `json:"comments"`
 }
 
 // --- 전역 변수 및 상수 ---
 
 var (
 	kakaoAPIKey string
-	httpClient  = &http.Client{Timeout: 10 * time.Second}
-	logger      *slog.Logger
+	// "KakaoAK <key>" 값은 불변이므로 main에서 한 번만 조립합니다. Header.Set의
+	// 키 정규화까지 건너뛰도록 정규형 키에 직접 대입할 []string 형태로 보관합니다.
+	kakaoAuthHeader []string
+	// 모든 카카오 호출이 공유하는 클라이언트입니다. 커넥션 풀과 HTTP/2 멀티플렉싱으로
+	// dapi.kakao.com에 대한 TLS 핸드셰이크를 요청마다 반복하지 않습니다.
+	httpClient = &http.Client{
+		Timeout: 5 * time.Second,
+		Transport: &http.Transport{
+			DialContext: (&net.Dialer{
+				Timeout:   1 * time.Second,
+				KeepAlive: 30 * time.Second,
+			}).DialContext,
+			ForceAttemptHTTP2:   true,
+			MaxIdleConns:        64,
+			MaxIdleConnsPerHost: 32,
+			IdleConnTimeout:     90 * time.Second,
+			TLSHandshakeTimeout: 2 * time.Second,
+		},
+	}
+	logger *slog.Logger
+
+	// 인기 장소는 서로 다른 질의에서도 반복 조회되므로, 웹/이미지 검색 결과를
+	// place_name 기준으로 잠시 캐시해 네트워크 호출과 JSON 파싱을 건너뜁니다.
+	webDocCache   = newTTLCache[[]WebDocument](1024, 5*time.Minute)
+	imageDocCache = newTTLCache[ImageDocument](1024, 5*time.Minute)
 )
 
 const (
 	kakaoMapURL   = "https://dapi.kakao.com/v2/local/search/keyword.json"
 	daumSearchURL = "https://dapi.kakao.com/v2/search"
-	systemPrompt  = `
+
+	// 고정 파라미터까지 컴파일 타임에 붙여둔 URL 접두사입니다.
+	// 호출 시에는 이스케이프한 query만 덧붙이면 되므로 포맷팅 비용이 없습니다.
+	mapSearchURLPrefix   = kakaoMapURL + "?query="
+	webSearchURLPrefix   = daumSearchURL + "/web?page=1&size=5&query="
+	imageSearchURLPrefix = daumSearchURL + "/image?page=1&size=1&query="
+
+	systemPrompt = `
 Using the provided JSON results, compile a detailed and visually appealing Markdown summary for the user.
 
 Each place **MUST** include:
@@ -89,159 +120,325 @@ Note:
 - Ensure all listed elements (title with link, image, address, category, contact, and summary) are always included for every place.`
 )
 
+// 내용이 고정된 응답은 호출마다 다시 만들지 않고 한 번만 구성합니다.
+var (
+	errEmptyQueryResult = &mcp.CallToolResult{
+		IsError: true,
+		Content: []mcp.Content{&mcp.TextContent{Text: "Query is empty"}},
+	}
+	searchCompleteResult = &mcp.CallToolResult{
+		Content: []mcp.Content{&mcp.TextContent{Text: "Search complete. All results have been streamed."}},
+	}
+)
+
+// --- JSON 직렬화 헬퍼 ---
+
+// marshalResult는 장소마다 새 버퍼를 할당하는 대신 sync.Pool로 버퍼를 재사용하여
+// 스트리밍 경로의 직렬화 비용을 줄입니다.
+var encBufPool = sync.Pool{
+	New: func() any { return new(bytes.Buffer) },
+}
+
+func marshalResult(v any) (string, error) {
+	buf := encBufPool.Get().(*bytes.Buffer)
+	defer func() {
+		buf.Reset()
+		encBufPool.Put(buf)
+	}()
+	if err := json.NewEncoder(buf).Encode(v); err != nil {
+		return "", err
+	}
+	// Encoder는 마지막에 개행을 추가하므로 제거합니다.
+	return string(bytes.TrimSuffix(buf.Bytes(), []byte("\n"))), nil
+}
+
 // --- Kakao API 호출 헬퍼 함수 ---
 
-func makeKakaoRequest(ctx context.Context, url string, target interface{}) error {
-	req, err := http.NewRequestWithContext(ctx, "GET", url, nil)
-	if err != nil {
-		return fmt.Errorf("failed to create request: %w", err)
+// kakaoRetries는 일시적 네트워크 오류와 5xx 응답에 대한 재시도 횟수입니다.
+// 카카오 호출은 전부 멱등한 GET이므로 재시도해도 안전합니다.
+const kakaoRetries = 2
+
+// doKakaoGet은 인증 헤더, 재시도, 상태 코드 확인을 한곳에서 처리합니다.
+// 성공 시 호출자가 resp.Body를 닫아야 합니다.
+func doKakaoGet(ctx context.Context, reqURL string) (*http.Response, error) {
+	var lastErr error
+	for attempt := 0; attempt <= kakaoRetries; attempt++ {
+		req, err := http.NewRequestWithContext(ctx, "GET", reqURL, nil)
+		if err != nil {
+			return nil, fmt.Errorf("failed to create request: %w", err)
+		}
+		req.Header["Authorization"] = kakaoAuthHeader
+
+		logger.Debug("Making Kakao API request", "url", reqURL, "attempt", attempt)
+		resp, err := httpClient.Do(req)
+		if err != nil {
+			lastErr = fmt.Errorf("request failed: %w", err)
+			if ctx.Err() != nil {
+				break
+			}
+			continue
+		}
+		if resp.StatusCode >= http.StatusInternalServerError && attempt < kakaoRetries {
+			logger.Warn("Kakao API request returned 5xx, retrying", "url", reqURL, "status", resp.Status)
+			resp.Body.Close()
+			lastErr = fmt.Errorf("API request failed with status: %s", resp.Status)
+			continue
+		}
+		if resp.StatusCode != http.StatusOK {
+			logger.Warn("Kakao API request returned non-200 status", "url", reqURL, "status", resp.Status)
+			resp.Body.Close()
+			return nil, fmt.Errorf("API request failed with status: %s", resp.Status)
+		}
+		logger.Debug("Kakao API request successful", "url", reqURL, "status", resp.Status)
+		return resp, nil
 	}
-	req.Header.Set("Authorization", "KakaoAK "+kakaoAPIKey)
+	logger.Error("Kakao API request failed after retries", "url", reqURL, "error", lastErr)
+	return nil, lastErr
+}
 
-	logger.Debug("Making Kakao API request", "url", url)
-	resp, err := httpClient.Do(req)
+func makeKakaoRequest(ctx context.Context, reqURL string, target interface{}) error {
+	resp, err := doKakaoGet(ctx, reqURL)
 	if err != nil {
-		logger.Error("Kakao API request failed", "url", url, "error", err)
-		return fmt.Errorf("request failed: %w", err)
+		return err
 	}
 	defer resp.Body.Close()
 
-	if resp.StatusCode != http.StatusOK {
-		logger.Warn("Kakao API request returned non-200 status", "url", url, "status", resp.Status)
-		return fmt.Errorf("API request failed with status: %s", resp.Status)
+	if err := json.NewDecoder(resp.Body).Decode(target); err != nil {
+		return fmt.Errorf("failed to decode response: %w", err)
 	}
-
-	logger.Debug("Kakao API request successful", "url", url, "status", resp.Status)
-	return json.NewDecoder(resp.Body).Decode(target)
+	// 디코딩 후 남은 바이트를 비워야 커넥션이 keep-alive 풀로 반환됩니다.
+	_, _ = io.Copy(io.Discard, resp.Body)
+	return nil
 }
 
-func fetchMapDocuments(ctx context.Context, query string) ([]MapDocument, error) {
-	var response KakaoLocalSearchResponse
-	url := fmt.Sprintf("%s?query=%s", kakaoMapURL, query)
-	err := makeKakaoRequest(ctx, url, &response)
+// streamMapDocuments는 키워드 검색 응답의 documents 배열을 토큰 단위로 디코딩하면서,
+// 각 문서가 도착하는 즉시 onDoc을 호출합니다. 전체 본문 수신을 기다리지 않으므로
+// 네트워크 수신과 장소별 보강 작업이 겹쳐서 진행됩니다. 처리한 문서 수를 반환합니다.
+func streamMapDocuments(ctx context.Context, query string, onDoc func(int, MapDocument)) (int, error) {
+	resp, err := doKakaoGet(ctx, mapSearchURLPrefix+url.QueryEscape(query))
 	if err != nil {
-		return nil, err
+		return 0, err
 	}
-	logger.Info("Fetched map documents", "query", query, "count", len(response.Documents))
-	return response.Documents, nil
-}
+	defer resp.Body.Close()
 
-func fetchWebDocuments(ctx context.Context, query string) ([]WebDocument, error) {
-	var response DaumWebSearchResponse
-	url := fmt.Sprintf("%s/web?query=%s&page=1&size=5", daumSearchURL, query)
-	err := makeKakaoRequest(ctx, url, &response)
+	dec := json.NewDecoder(resp.Body)
+	tok, err := dec.Token()
 	if err != nil {
-		return nil, err
+		return 0, fmt.Errorf("failed to decode response: %w", err)
+	}
+	if tok != json.Delim('{') {
+		return 0, fmt.Errorf("unexpected response shape: got %v", tok)
 	}
-	logger.Debug("Fetched web documents", "query", query, "count", len(response.Documents))
-	return response.Documents, nil
+
+	count := 0
+	for dec.More() {
+		keyTok, err := dec.Token()
+		if err != nil {
+			return count, fmt.Errorf("failed to decode response: %w", err)
+		}
+		key, ok := keyTok.(string)
+		if !ok {
+			return count, fmt.Errorf("unexpected response shape: got %v", keyTok)
+		}
+		if key != "documents" {
+			// meta 등 다른 최상위 필드는 통째로 건너뜁니다.
+			var skip json.RawMessage
+			if err := dec.Decode(&skip); err != nil {
+				return count, fmt.Errorf("failed to decode response: %w", err)
+			}
+			continue
+		}
+		if tok, err := dec.Token(); err != nil || tok != json.Delim('[') {
+			return count, fmt.Errorf("unexpected documents shape")
+		}
+		for dec.More() {
+			var doc MapDocument
+			if err := dec.Decode(&doc); err != nil {
+				return count, fmt.Errorf("failed to decode document: %w", err)
+			}
+			onDoc(count, doc)
+			count++
+		}
+		if _, err := dec.Token(); err != nil {
+			return count, fmt.Errorf("failed to decode response: %w", err)
+		}
+	}
+	// 디코딩 후 남은 바이트를 비워야 커넥션이 keep-alive 풀로 반환됩니다.
+	_, _ = io.Copy(io.Discard, resp.Body)
+
+	logger.Info("Fetched map documents", "query", query, "count", count)
+	return count, nil
+}
+
+func fetchWebDocuments(ctx context.Context, query string) ([]WebDocument, error) {
+	return webDocCache.getOrFetch(query, func() ([]WebDocument, error) {
+		var response DaumWebSearchResponse
+		err := makeKakaoRequest(ctx, webSearchURLPrefix+url.QueryEscape(query), &response)
+		if err != nil {
+			return nil, err
+		}
+		logger.Debug("Fetched web documents", "query", query, "count", len(response.Documents))
+		return response.Documents, nil
+	})
 }
 
 func fetchImageDocument(ctx context.Context, query string) (ImageDocument, error) {
-	var response DaumImageSearchResponse
-	url := fmt.Sprintf("%s/image?query=%s&page=1&size=1", daumSearchURL, query)
-	err := makeKakaoRequest(ctx, url, &response)
-	if err != nil {
-		return ImageDocument{}, err
+	return imageDocCache.getOrFetch(query, func() (ImageDocument, error) {
+		var response DaumImageSearchResponse
+		err := makeKakaoRequest(ctx, imageSearchURLPrefix+url.QueryEscape(query), &response)
+		if err != nil {
+			return ImageDocument{}, err
+		}
+		if len(response.Documents) > 0 {
+			logger.Debug("Fetched image document", "query", query, "image_url", response.Documents[0].ImageURL)
+			return response.Documents[0], nil
+		}
+		logger.Debug("No image document found", "query", query)
+		return ImageDocument{}, nil
+	})
+}
+
+// enrichConcurrency는 장소별 보강(fan-out) 시 동시에 처리할 최대 장소 수입니다.
+// 장소마다 웹/이미지 2건의 호출이 나가므로 카카오 레이트 리밋을 넘지 않도록 제한합니다.
+const enrichConcurrency = 8
+
+// progressBatchSize만큼 장소 결과를 모아 JSON 배열 하나로 전송해,
+// 알림마다 반복되는 직렬화·프레이밍·플러시 비용을 줄입니다.
+const progressBatchSize = 4
+
+// maxProgressBatchBytes를 넘으면 배치 개수가 차지 않았어도 먼저 내보내,
+// 댓글이 긴 장소들이 알림 메시지 하나를 지나치게 키우는 것을 막습니다.
+const maxProgressBatchBytes = 32 * 1024
+
+// enrichPlace는 한 장소의 웹 문서와 이미지를 병렬로 조회해 직렬화된 결과를 반환합니다.
+func enrichPlace(ctx context.Context, doc MapDocument) (string, error) {
+	var (
+		wg             sync.WaitGroup
+		webDocs        []WebDocument
+		imgDoc         ImageDocument
+		webErr, imgErr error
+	)
+	wg.Add(2)
+	go func() {
+		defer wg.Done()
+		webDocs, webErr = fetchWebDocuments(ctx, doc.PlaceName)
+	}()
+	go func() {
+		defer wg.Done()
+		imgDoc, imgErr = fetchImageDocument(ctx, doc.PlaceName)
+	}()
+	wg.Wait()
+
+	if webErr != nil {
+		return "", fmt.Errorf("web search failed: %w", webErr)
 	}
-	if len(response.Documents) > 0 {
-		logger.Debug("Fetched image document", "query", query, "image_url", response.Documents[0].ImageURL)
-		return response.Documents[0], nil
+	if imgErr != nil {
+		return "", fmt.Errorf("image search failed: %w", imgErr)
 	}
-	logger.Debug("No image document found", "query", query)
-	return ImageDocument{}, nil
+
+	result := KakaoLocalSearchResult{
+		MapDocument: doc,
+		Comments:    webDocs,
+		ImageURL:    imgDoc.ImageURL,
+	}
+	return marshalResult(result)
 }
 
 // --- MCP 도구 콜백 함수 ---
 
 func searchTool(ctx context.Context, req *mcp.CallToolRequest, options SearchSchema) (*mcp.CallToolResult, any, error) {
 	logger.Info("searchTool called", "query", options.Query)
-	// 1. GetSession()이 반환하는 mcp.Session 인터페이스를 *mcp.ServerSession 타입으로 단언합니다.
+	// GetSession()이 반환하는 mcp.Session 인터페이스를 *mcp.ServerSession 타입으로 단언합니다.
 	serverSession, ok := req.GetSession().(*mcp.ServerSession)
 	if !ok {
 		return nil, nil, fmt.Errorf("internal error: could not cast session to *mcp.ServerSession")
 	}
 
-	if kakaoAPIKey == "" {
-		logger.Error("Tool Execution Failed: KAKAO_API_KEY is not configured.")
-		return &mcp.CallToolResult{
-			IsError: true,
-			Content: []mcp.Content{&mcp.TextContent{Text: "Tool Execution Failed: KAKAO_API_KEY is not configured."}},
-		}, nil, nil
-	}
+	// KAKAO_API_KEY는 main에서 시작 시 검증되므로 호출마다 다시 확인하지 않습니다.
 	if options.Query == "" {
 		logger.Warn("Query is empty")
-		return &mcp.CallToolResult{
-			IsError: true,
-			Content: []mcp.Content{&mcp.TextContent{Text: "Query is empty"}},
-		}, nil, nil
+		return errEmptyQueryResult, nil, nil
 	}
 
-	// 2. 타입 단언으로 얻은 serverSession 변수를 사용하여 NotifyProgress를 호출합니다.
 	logger.Info("Notifying progress with system prompt")
 	_ = serverSession.NotifyProgress(ctx, &mcp.ProgressNotificationParams{
 		ProgressToken: req.Params.GetProgressToken(),
 		Message:       systemPrompt,
 	})
 
-	mapDocuments, err := fetchMapDocuments(ctx, options.Query)
+	// 장소별 보강을 직렬 루프 대신 제한된 동시성으로 fan-out하되, 키워드 응답에서
+	// 문서가 디코딩되는 즉시 보강을 시작해 수신과 보강을 겹칩니다.
+	// 실패한 장소는 빈 문자열로 남겨 스트리밍 단계에서 건너뜁니다.
+	var (
+		mu      sync.Mutex
+		results []string
+		wg      sync.WaitGroup
+	)
+	sem := make(chan struct{}, enrichConcurrency)
+	count, err := streamMapDocuments(ctx, options.Query, func(i int, doc MapDocument) {
+		mu.Lock()
+		results = append(results, "")
+		mu.Unlock()
+
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			sem <- struct{}{}
+			defer func() { <-sem }()
+
+			logger.Debug("Processing map document", "place_name", doc.PlaceName)
+			resultJSON, err := enrichPlace(ctx, doc)
+			if err != nil {
+				logger.Error("Error fetching details for place", "place_name", doc.PlaceName, "error", err)
+				return
+			}
+			mu.Lock()
+			results[i] = resultJSON
+			mu.Unlock()
+		}()
+	})
 	if err != nil {
+		// 이미 시작된 보강 고루틴이 끝난 뒤에 반환합니다.
+		wg.Wait()
 		logger.Error("Failed to fetch map documents", "query", options.Query, "error", err)
 		return nil, nil, fmt.Errorf("failed to fetch map documents: %w", err)
 	}
-
-	for _, doc := range mapDocuments {
-		logger.Debug("Processing map document", "place_name", doc.PlaceName)
-		var wg sync.WaitGroup
-		var webDocs []WebDocument
-		var imgDoc ImageDocument
-		var webErr, imgErr error
-
-		wg.Add(2)
-		go func(d MapDocument) {
-			defer wg.Done()
-			webDocs, webErr = fetchWebDocuments(ctx, d.PlaceName)
-		}(doc)
-		go func(d MapDocument) {
-			defer wg.Done()
-			imgDoc, imgErr = fetchImageDocument(ctx, d.PlaceName)
-		}(doc)
-		wg.Wait()
-
-		if webErr != nil || imgErr != nil {
-			logger.Error("Error fetching details for place", "place_name", doc.PlaceName, "web_error", webErr, "image_error", imgErr)
-			continue
-		}
-
-		result := KakaoLocalSearchResult{
-			PlaceName:    doc.PlaceName,
-			AddressName:  doc.AddressName,
-			CategoryName: doc.CategoryName,
-			PlaceURL:     doc.PlaceURL,
-			Phone:        doc.Phone,
-			Comments:     webDocs,
-			ImageURL:     imgDoc.ImageURL,
+	wg.Wait()
+
+	// MCP 알림은 순서를 보장해야 하므로 수집이 끝난 뒤 원래 순서대로 스트리밍하되,
+	// progressBatchSize 단위의 JSON 배열로 묶어 전송 횟수를 줄입니다.
+	total := float64(count)
+	batch := make([]string, 0, progressBatchSize)
+	batchBytes := 0
+	flush := func(done int) {
+		if len(batch) == 0 {
+			return
 		}
-
-		resultBytes, err := json.Marshal(result)
-		if err != nil {
-			logger.Error("Failed to marshal result", "place_name", doc.PlaceName, "error", err)
-			continue
-		}
-
-		// 3. 여기서도 serverSession 변수를 사용합니다.
-		logger.Debug("Notifying progress with search result", "place_name", doc.PlaceName)
+		logger.Debug("Notifying progress with result batch", "count", len(batch), "bytes", batchBytes)
 		_ = serverSession.NotifyProgress(ctx, &mcp.ProgressNotificationParams{
 			ProgressToken: req.Params.GetProgressToken(),
+			Progress:      float64(done),
+			Total:         total,
 			// Value 필드는 MCP 프로토콜의 ProgressNotificationParams에 없으므로 Message 필드를 사용합니다.
-			Message: string(resultBytes),
+			Message: "[" + strings.Join(batch, ",") + "]",
 		})
+		batch = batch[:0]
+		batchBytes = 0
 	}
+	for i, resultJSON := range results {
+		if resultJSON == "" {
+			continue
+		}
+		batch = append(batch, resultJSON)
+		batchBytes += len(resultJSON)
+		if len(batch) >= progressBatchSize || batchBytes >= maxProgressBatchBytes {
+			flush(i + 1)
+		}
+	}
+	flush(len(results))
 
 	logger.Info("Search complete. All results have been streamed.")
-	return &mcp.CallToolResult{
-		Content: []mcp.Content{&mcp.TextContent{Text: "Search complete. All results have been streamed."}},
-	}, nil, nil
+	return searchCompleteResult, nil, nil
 }
 
 // --- HTTP 로깅 미들웨어 ---
@@ -278,6 +475,7 @@ func main() {
 		logger.Error("FATAL: KAKAO_API_KEY environment variable is not set.")
 		os.Exit(1)
 	}
+	kakaoAuthHeader = []string{"KakaoAK " + kakaoAPIKey}
 
 	mcpServer := mcp.NewServer(&mcp.Implementation{
 		Name:    "mcp-server-kakao-map-go",
@@ -297,7 +495,7 @@ func main() {
 	mux.Handle("/", loggingMiddleware(handler))
 
 	port := "8080"
-	logger.Info("MCP server with SSE is running", "url", "http://localhost:"+port)
+	logger.Info("MCP server with streamable HTTP transport is running", "url", "http://localhost:"+port)
 	if err := http.ListenAndServe(":"+port, mux); err != nil {
 		logger.Error("Failed to start HTTP server", "error", err)
 		os.Exit(1)